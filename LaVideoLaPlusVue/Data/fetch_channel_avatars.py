@@ -4,21 +4,44 @@ Script pour récupérer les URLs des avatars YouTube et enrichir le fichier data
 
 Usage:
 1. Remplacer 'YOUR_YOUTUBE_API_KEY_HERE' par votre vraie clé API
-2. Exécuter: python fetch_channel_avatars.py
+2. Exécuter: python fetch_channel_avatars.py [--force-refresh] [-v]
+
+Par défaut seules les chaînes sans channelAvatarUrl sont interrogées;
+--force-refresh récupère à nouveau les avatars de toutes les chaînes.
+Les logs vont sur stdout avec le reste de la sortie, au niveau INFO par défaut
+(un résumé par batch et les erreurs API); -v passe en DEBUG et affiche le
+détail de chaque chaîne.
 
 Le script va:
-- Lire data.json existant
-- Extraire tous les channelIds uniques
-- Récupérer les URLs d'avatars via l'API YouTube
+- Lire data.json existant et en écrire une sauvegarde compressée (data_backup.json.gz)
+- Indexer les entrées par channelId (une seule passe)
+- Récupérer via l'API YouTube les avatars manquants, absents du cache (avatar_cache.json,
+  entrées valables AVATAR_CACHE_TTL)
 - Enrichir chaque entrée avec channelAvatarUrl
 - Sauvegarder le fichier mis à jour
+
+Restaurer la sauvegarde (JSON compact, gzip) en ré-indentant data.json pour
+qu'il reste lisible et diffable:
+    python -c "import gzip, orjson; open('data.json', 'wb').write(orjson.dumps(orjson.loads(gzip.open('data_backup.json.gz').read()), option=orjson.OPT_INDENT_2))"
+
+avatar_cache.json et data_backup.json.gz sont exclus de la cible Xcode
+(membershipExceptions) pour ne pas être embarqués dans l'app.
 """
 
-import json
+import argparse
+import gzip
+import logging
+import orjson
+import os
 import requests
 import sys
+import time
 from collections import defaultdict
-from typing import Dict, List, Set
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # ==========================================
 # CONFIGURATION
@@ -29,133 +52,274 @@ YOUTUBE_API_KEY = "YOUR_YOUTUBE_API_KEY_HERE"
 
 # Fichiers
 DATA_JSON_PATH = "data.json"
-BACKUP_PATH = "data_backup.json"
+BACKUP_PATH = "data_backup.json.gz"
+AVATAR_CACHE_PATH = "avatar_cache.json"
+
+# Durée de validité d'une entrée du cache (secondes): au-delà, l'avatar est redemandé
+AVATAR_CACHE_TTL = 30 * 24 * 3600
 
 # API YouTube Data v3
 YOUTUBE_API_BASE = "https://www.googleapis.com/youtube/v3"
 
+# Requêtes
+BATCH_SIZE = 50
+MAX_CONCURRENT_BATCHES = 10
+REQUEST_TIMEOUT = 10
+MAX_RETRIES = 5
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+
+# Session partagée: les batches réutilisent les connexions HTTPS (keep-alive)
+# au lieu de refaire une poignée de main TCP+TLS par requête.
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=MAX_CONCURRENT_BATCHES,
+    max_retries=Retry(
+        total=MAX_RETRIES,
+        backoff_factor=RETRY_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=["GET"],
+    ),
+))
+
+log = logging.getLogger(__name__)
+
 # ==========================================
 # FONCTIONS PRINCIPALES
 # ==========================================
 
 def load_json_data(file_path: str) -> List[Dict]:
-    """Charge le fichier JSON existant."""
+    """
+    Charge le fichier JSON existant.
+
+    Le fichier est lu en une seule fois: toutes les entrées sont ensuite
+    enrichies puis réécrites, une lecture en streaming le parserait deux fois.
+    """
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        with open(file_path, 'rb') as f:
+            data = orjson.loads(f.read())
         print(f"✅ Fichier {file_path} chargé: {len(data)} entrées")
         return data
     except Exception as e:
         print(f"❌ Erreur lors du chargement de {file_path}: {e}")
         sys.exit(1)
 
-def save_json_data(data: List[Dict], file_path: str) -> None:
-    """Sauvegarde les données dans un fichier JSON."""
+def save_json_data(data: List[Dict], file_path: str, compact: bool = False) -> None:
+    """
+    Sauvegarde les données dans un fichier JSON.
+
+    Avec compact=True le JSON est écrit sans indentation (fichier ~2x plus petit).
+    Un chemin en .gz est compressé en gzip (niveau 1: rapide, ~5x plus petit).
+    """
+    option = None if compact else orjson.OPT_INDENT_2
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        if file_path.endswith('.gz'):
+            f = gzip.open(file_path, 'wb', compresslevel=1)
+        else:
+            f = open(file_path, 'wb')
+        with f:
+            f.write(orjson.dumps(data, option=option))
         print(f"✅ Fichier {file_path} sauvegardé: {len(data)} entrées")
     except Exception as e:
         print(f"❌ Erreur lors de la sauvegarde de {file_path}: {e}")
         sys.exit(1)
 
-def extract_unique_channel_ids(data: List[Dict]) -> Set[str]:
-    """Extrait tous les channelIds uniques du dataset."""
-    channel_ids = set()
+def load_avatar_cache(path: str = AVATAR_CACHE_PATH) -> Dict[str, Dict]:
+    """
+    Charge le cache des avatars déjà récupérés.
+
+    Returns:
+        Dict mapping channelId -> {"url": avatar_url, "fetched": timestamp}
+        (url None: chaîne sans avatar sur YouTube lors de la dernière requête)
+    """
+    if not os.path.exists(path):
+        return {}
+
+    try:
+        with open(path, 'rb') as f:
+            cache = orjson.loads(f.read())
+        print(f"✅ Cache {path} chargé: {len(cache)} avatars")
+        return cache
+    except Exception as e:
+        print(f"⚠️ Cache {path} illisible, il sera reconstruit: {e}")
+        return {}
+
+def save_avatar_cache(cache: Dict[str, Dict], path: str = AVATAR_CACHE_PATH) -> None:
+    """Sauvegarde le cache des avatars de manière atomique."""
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(orjson.dumps(cache, option=orjson.OPT_INDENT_2))
+        os.replace(tmp_path, path)
+        print(f"✅ Cache {path} sauvegardé: {len(cache)} avatars")
+    except Exception as e:
+        print(f"⚠️ Erreur lors de la sauvegarde du cache {path}: {e}")
+
+def index_channels(data: List[Dict]) -> Tuple[Dict[str, List[Dict]], Set[str]]:
+    """
+    Indexe les entrées du dataset par channelId en une seule passe.
+
+    Returns:
+        (channelId -> entrées de la chaîne, channelIds ayant au moins une entrée sans channelAvatarUrl)
+    """
+    items_by_channel = defaultdict(list)
+    ids_needing_avatar = set()
+    
     for item in data:
-        if 'channelId' in item:
-            channel_ids.add(item['channelId'])
+        channel_id = item.get('channelId')
+        if channel_id:
+            items_by_channel[channel_id].append(item)
+            if not item.get('channelAvatarUrl'):
+                ids_needing_avatar.add(channel_id)
     
-    print(f"📊 {len(channel_ids)} chaînes YouTube uniques trouvées")
-    return channel_ids
+    print(f"📊 {len(items_by_channel)} chaînes YouTube uniques trouvées, {len(ids_needing_avatar)} sans avatar")
+    return items_by_channel, ids_needing_avatar
+
+def fetch_avatar_batch(batch: List[str], batch_number: int) -> Dict[str, Optional[str]]:
+    """
+    Récupère les URLs d'avatars pour une batch de channel IDs (50 max).
+
+    Les erreurs 429/5xx sont retentées avec un backoff exponentiel par SESSION.
+
+    Returns:
+        Dict mapping channelId -> avatar_url, ou None si l'API a répondu sans
+        avatar pour cette chaîne (supprimée, renommée...). Si la requête échoue,
+        les chaînes de la batch sont absentes du résultat.
+    """
+    url = f"{YOUTUBE_API_BASE}/channels"
+    params = {
+        'part': 'snippet',
+        'id': ",".join(batch),
+        'key': YOUTUBE_API_KEY,
+        'fields': 'items(id,snippet(title,thumbnails))'
+    }
+    avatar_urls = {}
+
+    try:
+        response = SESSION.get(url, params=params, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+
+        data = response.json()
+
+        if 'items' in data:
+            for item in data['items']:
+                channel_id = item['id']
+                channel_title = item['snippet']['title']
+
+                # Prioriser la meilleure qualité d'avatar disponible
+                thumbnails = item['snippet']['thumbnails']
+                avatar_url = None
+
+                # Ordre de priorité: high > medium > default
+                for quality in ['high', 'medium', 'default']:
+                    if quality in thumbnails:
+                        avatar_url = thumbnails[quality]['url']
+                        break
+
+                if avatar_url:
+                    avatar_urls[channel_id] = avatar_url
+                    log.debug("  ✅ %s: %s", channel_title, avatar_url)
+                else:
+                    log.debug("  ⚠️ %s: Pas d'avatar trouvé", channel_title)
 
-def fetch_channel_avatars_batch(channel_ids: List[str]) -> Dict[str, str]:
+        # Vérifier les chaînes non trouvées dans cette batch
+        found_ids = set(item['id'] for item in data.get('items', []))
+        missing_ids = set(batch) - found_ids
+        for missing_id in missing_ids:
+            log.debug("  ❌ Chaîne non trouvée: %s", missing_id)
+
+        log.info("🔍 Batch %d: %d/%d avatars", batch_number, len(avatar_urls), len(batch))
+
+        # La requête a abouti: les chaînes sans avatar sont des absences confirmées
+        for channel_id in batch:
+            avatar_urls.setdefault(channel_id, None)
+
+    except requests.exceptions.RequestException as e:
+        log.error("❌ Erreur API pour la batch %d: %s", batch_number, e)
+    except Exception as e:
+        log.error("❌ Erreur inattendue pour la batch %d: %s", batch_number, e)
+
+    return avatar_urls
+
+def fetch_channel_avatars_batch(channel_ids: List[str]) -> Dict[str, Optional[str]]:
     """
     Récupère les URLs d'avatars pour une liste de channel IDs via l'API YouTube.
-    
+
+    Les batches sont envoyées en parallèle: la durée totale est celle de la
+    batch la plus lente au lieu de la somme de toutes les batches.
+
     Returns:
-        Dict mapping channelId -> avatar_url
+        Dict mapping channelId -> avatar_url (None si l'API n'a pas d'avatar
+        pour cette chaîne, voir fetch_avatar_batch)
     """
     if not YOUTUBE_API_KEY or YOUTUBE_API_KEY == "YOUR_YOUTUBE_API_KEY_HERE":
         print("❌ Erreur: Clé API YouTube non configurée!")
         print("📝 Modifiez la variable YOUTUBE_API_KEY dans le script")
         sys.exit(1)
-    
+
     # L'API YouTube peut traiter jusqu'à 50 IDs par requête
-    batch_size = 50
+    batches = [channel_ids[i:i + BATCH_SIZE] for i in range(0, len(channel_ids), BATCH_SIZE)]
     avatar_urls = {}
-    
-    for i in range(0, len(channel_ids), batch_size):
-        batch = channel_ids[i:i + batch_size]
-        batch_str = ",".join(batch)
-        
-        print(f"🔍 Récupération batch {i//batch_size + 1}: {len(batch)} chaînes...")
-        
-        url = f"{YOUTUBE_API_BASE}/channels"
-        params = {
-            'part': 'snippet',
-            'id': batch_str,
-            'key': YOUTUBE_API_KEY,
-            'fields': 'items(id,snippet(title,thumbnails))'
-        }
-        
-        try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            if 'items' in data:
-                for item in data['items']:
-                    channel_id = item['id']
-                    channel_title = item['snippet']['title']
-                    
-                    # Prioriser la meilleure qualité d'avatar disponible
-                    thumbnails = item['snippet']['thumbnails']
-                    avatar_url = None
-                    
-                    # Ordre de priorité: high > medium > default
-                    for quality in ['high', 'medium', 'default']:
-                        if quality in thumbnails:
-                            avatar_url = thumbnails[quality]['url']
-                            break
-                    
-                    if avatar_url:
-                        avatar_urls[channel_id] = avatar_url
-                        print(f"  ✅ {channel_title}: {avatar_url}")
-                    else:
-                        print(f"  ⚠️ {channel_title}: Pas d'avatar trouvé")
-            
-            # Vérifier les chaînes non trouvées dans cette batch
-            found_ids = set(item['id'] for item in data.get('items', []))
-            missing_ids = set(batch) - found_ids
-            for missing_id in missing_ids:
-                print(f"  ❌ Chaîne non trouvée: {missing_id}")
-                
-        except requests.exceptions.RequestException as e:
-            print(f"❌ Erreur API pour la batch {i//batch_size + 1}: {e}")
-            continue
-        except Exception as e:
-            print(f"❌ Erreur inattendue pour la batch {i//batch_size + 1}: {e}")
-            continue
-    
-    print(f"🎯 {len(avatar_urls)} avatars récupérés sur {len(channel_ids)} chaînes")
+
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_BATCHES) as executor:
+        results = executor.map(fetch_avatar_batch, batches, range(1, len(batches) + 1))
+        for batch_avatar_urls in results:
+            avatar_urls.update(batch_avatar_urls)
+
+    found_count = sum(1 for avatar_url in avatar_urls.values() if avatar_url)
+    print(f"🎯 {found_count} avatars récupérés sur {len(channel_ids)} chaînes")
     return avatar_urls
 
-def enrich_data_with_avatars(data: List[Dict], avatar_urls: Dict[str, str]) -> List[Dict]:
-    """Enrichit chaque entrée du dataset avec l'URL de l'avatar de la chaîne."""
+def enrich_data_with_avatars(
+    items_by_channel: Dict[str, List[Dict]],
+    fetched_urls: Dict[str, str],
+    cached_urls: Dict[str, str],
+) -> None:
+    """
+    Enrichit chaque entrée du dataset avec l'URL de l'avatar de la chaîne.
+
+    Les entrées sont modifiées en place via l'index de index_channels().
+    Les URLs tout juste récupérées via l'API remplacent celles qui diffèrent;
+    les URLs du cache ne remplissent que les entrées sans channelAvatarUrl,
+    pour ne jamais écraser une URL déjà présente dans data.json (chaîne dont
+    seules les nouvelles vidéos n'ont pas encore d'avatar).
+    """
     enriched_count = 0
+    for channel_id, avatar_url in fetched_urls.items():
+        for item in items_by_channel.get(channel_id, ()):
+            if item.get('channelAvatarUrl') != avatar_url:
+                item['channelAvatarUrl'] = avatar_url
+                enriched_count += 1
     
-    for item in data:
-        if 'channelId' in item and item['channelId'] in avatar_urls:
-            item['channelAvatarUrl'] = avatar_urls[item['channelId']]
-            enriched_count += 1
+    for channel_id, avatar_url in cached_urls.items():
+        for item in items_by_channel.get(channel_id, ()):
+            if not item.get('channelAvatarUrl'):
+                item['channelAvatarUrl'] = avatar_url
+                enriched_count += 1
     
     print(f"📝 {enriched_count} entrées enrichies avec les avatars")
-    return data
 
 def main():
     """Fonction principale du script."""
+    parser = argparse.ArgumentParser(description="Enrichit data.json avec les avatars des chaînes YouTube.")
+    parser.add_argument(
+        '--force-refresh',
+        action='store_true',
+        help="récupère à nouveau les avatars de toutes les chaînes, même déjà renseignés ou en cache",
+    )
+    parser.add_argument(
+        '-v', '--verbose',
+        action='store_true',
+        help="affiche le détail de chaque chaîne récupérée",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(message)s",
+        stream=sys.stdout,
+    )
+    
     print("🚀 Démarrage du script de récupération d'avatars YouTube")
     print("=" * 60)
     
@@ -165,38 +329,76 @@ def main():
     
     # 2. Créer une sauvegarde
     print("💾 Création d'une sauvegarde...")
-    save_json_data(data, BACKUP_PATH)
+    save_json_data(data, BACKUP_PATH, compact=True)
     
-    # 3. Extraire les channel IDs uniques
-    print("🔍 Extraction des channel IDs...")
-    channel_ids = extract_unique_channel_ids(data)
+    # 3. Indexer les entrées par channel ID
+    print("🔍 Indexation des entrées par channel ID...")
+    items_by_channel, ids_needing_avatar = index_channels(data)
+    channel_ids = items_by_channel.keys()
     
     if not channel_ids:
         print("❌ Aucun channel ID trouvé dans le fichier!")
         sys.exit(1)
     
-    # 4. Récupérer les avatars via l'API YouTube
-    print("🌐 Récupération des avatars via l'API YouTube...")
-    avatar_urls = fetch_channel_avatars_batch(list(channel_ids))
+    # 4. Récupérer via l'API YouTube les avatars manquants et absents du cache
+    avatar_cache = load_avatar_cache(AVATAR_CACHE_PATH)
+    now = int(time.time())
+    fresh_cache = {
+        channel_id: entry
+        for channel_id, entry in avatar_cache.items()
+        if now - entry.get('fetched', 0) < AVATAR_CACHE_TTL
+    }
+    if args.force_refresh:
+        missing_ids = set(channel_ids)
+    else:
+        missing_ids = ids_needing_avatar - fresh_cache.keys()
+    fetched_urls = {}
+    not_found_ids = set()
+    
+    if missing_ids:
+        print(f"🌐 Récupération de {len(missing_ids)} avatars via l'API YouTube...")
+        fetch_results = fetch_channel_avatars_batch(sorted(missing_ids))
+        fetched_urls = {cid: url for cid, url in fetch_results.items() if url}
+        not_found_ids = fetch_results.keys() - fetched_urls.keys()
+        
+        # Les absences confirmées sont aussi mises en cache (url None) pour ne
+        # pas redemander ces chaînes à chaque exécution
+        for channel_id, avatar_url in fetch_results.items():
+            avatar_cache[channel_id] = {'url': avatar_url, 'fetched': now}
+        if fetch_results:
+            save_avatar_cache(avatar_cache, AVATAR_CACHE_PATH)
+    else:
+        print("✅ Tous les avatars sont déjà connus, aucun appel API")
+    
+    # Le cache ne sert qu'aux entrées sans avatar (voir enrich_data_with_avatars)
+    cached_urls = {
+        channel_id: fresh_cache[channel_id]['url']
+        for channel_id in ids_needing_avatar - missing_ids
+        if fresh_cache.get(channel_id, {}).get('url')
+    }
     
-    if not avatar_urls:
+    # Échec uniquement si des avatars manquaient, qu'aucun n'a pu être
+    # appliqué et que l'API n'a rien confirmé (erreurs réseau/quota)
+    if missing_ids and not fetched_urls and not cached_urls and not not_found_ids:
         print("❌ Aucun avatar récupéré!")
         sys.exit(1)
     
     # 5. Enrichir les données
     print("📝 Enrichissement des données...")
-    enriched_data = enrich_data_with_avatars(data, avatar_urls)
+    enrich_data_with_avatars(items_by_channel, fetched_urls, cached_urls)
     
     # 6. Sauvegarder le fichier mis à jour
     print("💾 Sauvegarde du fichier enrichi...")
-    save_json_data(enriched_data, DATA_JSON_PATH)
+    save_json_data(data, DATA_JSON_PATH)
     
     print("=" * 60)
     print("🎉 Script terminé avec succès!")
     print(f"📊 Statistiques:")
-    print(f"   • Entrées totales: {len(enriched_data)}")
+    print(f"   • Entrées totales: {len(data)}")
     print(f"   • Chaînes uniques: {len(channel_ids)}")
-    print(f"   • Avatars récupérés: {len(avatar_urls)}")
+    print(f"   • Avatars récupérés: {len(fetched_urls)}")
+    print(f"   • Avatars en cache: {len(cached_urls)}")
+    print(f"   • Chaînes sans avatar sur YouTube: {len(not_found_ids)}")
     print(f"   • Fichier sauvegardé: {DATA_JSON_PATH}")
     print(f"   • Sauvegarde créée: {BACKUP_PATH}")
 
@@ -4,24 +4,34 @@ Script pour visualiser la base de données YouTube sous forme de grille HTML.
 Affiche les YouTubers avec leurs avatars et toutes leurs vidéos en miniatures.
 """
 
-import json
+import argparse
+import heapq
+import orjson
 from collections import defaultdict
 from datetime import datetime
+from html import escape
 import os
 
 def load_youtube_data(file_path):
     """Charge les données JSON depuis le fichier."""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    with open(file_path, 'rb') as f:
+        return orjson.loads(f.read())
 
-def group_videos_by_channel(videos):
-    """Groupe les vidéos par chaîne YouTube."""
+def group_videos_by_channel(videos, sort=True):
+    """
+    Groupe les vidéos par chaîne YouTube.
+    
+    Avec sort=False les chaînes restent dans l'ordre de première apparition.
+    """
     channels = defaultdict(list)
     
     for video in videos:
         channel_key = (video['channelId'], video['channelTitle'], video.get('channelAvatarUrl', ''))
         channels[channel_key].append(video)
     
+    if not sort:
+        return list(channels.items())
+    
     # Convertir en liste triée par nombre de vidéos (décroissant)
     sorted_channels = sorted(channels.items(), key=lambda x: len(x[1]), reverse=True)
     
@@ -31,13 +41,85 @@ def format_number(num):
     """Formate les nombres avec des espaces pour la lisibilité."""
     return f"{num:,}".replace(',', ' ')
 
-def generate_html(channels_data):
-    """Génère le contenu HTML."""
+# Gabarits HTML précompilés (str.format liés une seule fois)
+_CHANNEL_HEADER_TMPL = """
+    <div class="channel-section">
+        <div class="channel-header">{avatar}
+            <div class="channel-info">
+                <div class="channel-name">{name}</div>
+                <div class="video-count"><span>{count}</span> vidéo{plural}</div>
+            </div>
+        </div>
+        
+        <div class="videos-grid">""".format
+
+_AVATAR_TMPL = """
+            <img src="{url}" alt="{name}" class="channel-avatar" width="80" height="80" loading="lazy" decoding="async"
+                 onerror="this.onerror=null; this.outerHTML='<div class=\\'channel-avatar missing\\'>👤</div>'">""".format
+
+_MISSING_AVATAR = """
+            <div class="channel-avatar missing">👤</div>"""
+
+_CHANNEL_FOOTER = """
+        </div>
+    </div>"""
+
+_VIDEO_TMPL = """
+            <div class="video-item" title="{title}">{thumbnail}
+                <div class="video-views">{views} vues</div>
+            </div>""".format
+
+_THUMBNAIL_TMPL = """
+                <img src="{url}" alt="{title}" class="video-thumbnail" width="320" height="180" loading="lazy" decoding="async"
+                     onerror="this.onerror=null; this.outerHTML='<div class=\\'video-thumbnail missing\\'>Miniature non disponible</div>'">""".format
+
+_MISSING_THUMBNAIL = """
+                <div class="video-thumbnail missing">Miniature non disponible</div>"""
+
+def _render_video(video):
+    """Génère le HTML d'une vidéo."""
+    title = escape(video.get('title', 'Sans titre'))
+    thumbnail_url = video.get('thumbnailUrl', '')
+    
+    if thumbnail_url:
+        thumbnail = _THUMBNAIL_TMPL(url=thumbnail_url, title=title)
+    else:
+        thumbnail = _MISSING_THUMBNAIL
+    
+    return _VIDEO_TMPL(
+        title=title,
+        thumbnail=thumbnail,
+        views=format_number(video.get('viewCount', 0)),
+    )
+
+def render_channel(channel):
+    """Génère le HTML de la section d'un YouTuber et de toutes ses vidéos."""
+    channel_info, videos = channel
+    channel_id, channel_name, avatar_url = channel_info
+    channel_name = escape(channel_name)
+    video_count = len(videos)
+    
+    if avatar_url:
+        avatar = _AVATAR_TMPL(url=avatar_url, name=channel_name)
+    else:
+        avatar = _MISSING_AVATAR
+    
+    header = _CHANNEL_HEADER_TMPL(
+        avatar=avatar,
+        name=channel_name,
+        count=video_count,
+        plural='s' if video_count > 1 else '',
+    )
+    
+    return header + "".join(_render_video(video) for video in videos) + _CHANNEL_FOOTER
+
+def iter_html(channels_data):
+    """Génère le contenu HTML fragment par fragment."""
     
     total_videos = sum(len(videos) for _, videos in channels_data)
     total_channels = len(channels_data)
     
-    html = f"""<!DOCTYPE html>
+    yield f"""<!DOCTYPE html>
 <html lang="fr">
 <head>
     <meta charset="UTF-8">
@@ -170,6 +252,7 @@ def generate_html(channels_data):
         
         .video-thumbnail {{
             width: 100%;
+            height: auto;
             aspect-ratio: 16/9;
             object-fit: cover;
         }}
@@ -221,70 +304,27 @@ def generate_html(channels_data):
 """
     
     # Générer la section pour chaque YouTuber
-    for channel_info, videos in channels_data:
-        channel_id, channel_name, avatar_url = channel_info
-        video_count = len(videos)
-        
-        html += f"""
-    <div class="channel-section">
-        <div class="channel-header">"""
-        
-        if avatar_url:
-            html += f"""
-            <img src="{avatar_url}" alt="{channel_name}" class="channel-avatar" 
-                 onerror="this.onerror=null; this.outerHTML='<div class=\\'channel-avatar missing\\'>👤</div>'">"""
-        else:
-            html += f"""
-            <div class="channel-avatar missing">👤</div>"""
-        
-        html += f"""
-            <div class="channel-info">
-                <div class="channel-name">{channel_name}</div>
-                <div class="video-count"><span>{video_count}</span> vidéo{'s' if video_count > 1 else ''}</div>
-            </div>
-        </div>
-        
-        <div class="videos-grid">"""
-        
-        # Ajouter chaque vidéo
-        for video in videos:
-            view_count = format_number(video.get('viewCount', 0))
-            thumbnail_url = video.get('thumbnailUrl', '')
-            title = video.get('title', 'Sans titre')
-            video_id = video.get('id', '')
-            
-            html += f"""
-            <div class="video-item" title="{title.replace('"', '&quot;')}">"""
-            
-            if thumbnail_url:
-                html += f"""
-                <img src="{thumbnail_url}" alt="{title.replace('"', '&quot;')}" class="video-thumbnail"
-                     onerror="this.onerror=null; this.outerHTML='<div class=\\'video-thumbnail missing\\'>Miniature non disponible</div>'">"""
-            else:
-                html += f"""
-                <div class="video-thumbnail missing">Miniature non disponible</div>"""
-            
-            html += f"""
-                <div class="video-views">{view_count} vues</div>
-            </div>"""
-        
-        html += """
-        </div>
-    </div>"""
+    yield from map(render_channel, channels_data)
     
     # Footer avec timestamp
     timestamp = datetime.now().strftime("%d/%m/%Y à %H:%M:%S")
-    html += f"""
+    yield f"""
     <div class="timestamp">
         Généré le {timestamp}
     </div>
 </body>
 </html>"""
-    
-    return html
 
 def main():
     """Fonction principale."""
+    parser = argparse.ArgumentParser(description="Génère une visualisation HTML de la base de données YouTube.")
+    parser.add_argument(
+        '--stats-only',
+        action='store_true',
+        help="affiche uniquement les statistiques, sans générer le fichier HTML",
+    )
+    args = parser.parse_args()
+    
     # Chemins des fichiers
     data_file = "LaVideoLaPlusVue/Data/data.json"
     output_file = "youtube_db_visualization.html"
@@ -299,21 +339,21 @@ def main():
     videos = load_youtube_data(data_file)
     print(f"✓ {len(videos)} vidéos chargées")
     
-    # Grouper par chaîne
+    # Grouper par chaîne (le tri complet n'est utile que pour le HTML)
     print("Organisation des données par YouTuber...")
-    channels = group_videos_by_channel(videos)
+    channels = group_videos_by_channel(videos, sort=not args.stats_only)
     print(f"✓ {len(channels)} YouTubers trouvés")
     
-    # Générer le HTML
-    print("Génération du fichier HTML...")
-    html_content = generate_html(channels)
-    
-    # Écrire le fichier
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    if not args.stats_only:
+        # Générer le HTML
+        print("Génération du fichier HTML...")
+        # Écrire le fichier au fil de la génération, sans garder tout le HTML en mémoire
+        with open(output_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            f.writelines(iter_html(channels))
+        
+        print(f"\n✅ Fichier généré avec succès : {output_file}")
+        print(f"   Taille : {os.path.getsize(output_file) / 1024 / 1024:.2f} MB")
     
-    print(f"\n✅ Fichier généré avec succès : {output_file}")
-    print(f"   Taille : {os.path.getsize(output_file) / 1024 / 1024:.2f} MB")
     print("\n📊 Statistiques :")
     print(f"   - {len(channels)} YouTubers")
     print(f"   - {len(videos)} vidéos au total")
@@ -321,7 +361,8 @@ def main():
     
     # Top 5 des YouTubers avec le plus de vidéos
     print("\n🏆 Top 5 des YouTubers avec le plus de vidéos :")
-    for i, (channel_info, vids) in enumerate(channels[:5], 1):
+    top_channels = heapq.nlargest(5, channels, key=lambda x: len(x[1]))
+    for i, (channel_info, vids) in enumerate(top_channels, 1):
         _, channel_name, _ = channel_info
         print(f"   {i}. {channel_name} : {len(vids)} vidéos")
 